@@ -1,11 +1,16 @@
 import streamlit as st
 import requests
 import pandas as pd
+import json
+import hashlib
+import threading
+from concurrent.futures import Future
 from datetime import datetime
 
 # API configurations
 GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
 SEGMIND_API_URL = "https://api.segmind.com/v1/recraft-v3"  # Segmind API URL
+API_TIMEOUT = 120  # Seconds to wait for the API to connect or send data
 
 # Language options for recipes
 LANGUAGES = {
@@ -53,6 +58,87 @@ def get_dynamic_emoji(recipe_name):
             return emoji
     return "🍳"  # Default emoji for recipes
 
+# Process-wide registry of in-flight API calls, shared by every Streamlit session
+@st.cache_resource
+def get_inflight_registry():
+    return {
+        "lock": threading.Lock(),
+        "inflight": {},  # Request key -> Future of the leader's response snapshot
+        "stats": {"requests": 0, "coalesced": 0}
+    }
+
+# Function to POST to an API and snapshot the response as plain data
+def post_snapshot(url, headers, payload, params=None):
+    response = requests.post(url, headers=headers, json=payload, params=params, timeout=API_TIMEOUT)
+    # Copy the data out so no live Response object is shared between threads
+    return response.status_code, response.headers.copy(), response.content
+
+# Function to POST to an API, sharing the response with identical requests already in flight
+def coalesced_post(url, headers, payload, params=None):
+    """
+    Issues the request unless an identical one (same URL, payload and credentials)
+    is already in flight, in which case it waits for that request and shares its
+    response. Returns a (status_code, headers, content) tuple.
+    """
+    registry = get_inflight_registry()
+    # Credentials live in params (Gemini) or headers (Segmind); hash them so
+    # requests are only shared within one API key and no raw secret is stored
+    credentials = hashlib.sha256(json.dumps([params, headers], sort_keys=True).encode()).hexdigest()
+    key = json.dumps([url, payload, credentials], sort_keys=True, ensure_ascii=False)
+
+    with registry["lock"]:
+        registry["stats"]["requests"] += 1
+        future = registry["inflight"].get(key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            registry["inflight"][key] = future
+
+    if not is_leader:
+        # Wait as long as the leader does; its own request timeout bounds the call
+        try:
+            return future.result()
+        finally:
+            # Only count the call as saved once the shared result has arrived
+            with registry["lock"]:
+                registry["stats"]["coalesced"] += 1
+            log_coalesce_stats()
+
+    try:
+        snapshot = post_snapshot(url, headers, payload, params)
+        future.set_result(snapshot)
+        return snapshot
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        # Release waiting requests even if the leader was interrupted (e.g. script stop)
+        if not future.done():
+            future.set_exception(RuntimeError("The shared API request was interrupted."))
+        with registry["lock"]:
+            registry["inflight"].pop(key, None)
+        log_coalesce_stats()
+
+# Function to get the request coalescing statistics
+def get_coalesce_stats():
+    registry = get_inflight_registry()
+    with registry["lock"]:
+        requests_count = registry["stats"]["requests"]
+        coalesced_count = registry["stats"]["coalesced"]
+    return {
+        "requests": requests_count,
+        "coalesced": coalesced_count,
+        "rate": coalesced_count / requests_count if requests_count else 0.0
+    }
+
+# Function to print the request coalescing statistics to the server log
+def log_coalesce_stats():
+    coalesce_stats = get_coalesce_stats()
+    print(
+        f"Request coalescing (server-wide): {coalesce_stats['coalesced']} / {coalesce_stats['requests']} "
+        f"API calls saved ({coalesce_stats['rate']:.0%})"
+    )
+
 # Function to generate a recipe post using Gemini API
 def generate_recipe_post_gemini(recipe_name_or_text, language):
     try:
@@ -91,17 +177,17 @@ def generate_recipe_post_gemini(recipe_name_or_text, language):
             "key": st.session_state.gemini_api_key
         }
         
-        response = requests.post(GEMINI_API_URL, headers=headers, json=payload, params=params)
+        status_code, _, content = coalesced_post(GEMINI_API_URL, headers, payload, params)
         
-        if response.status_code == 200:
-            generated_text = response.json().get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
+        if status_code == 200:
+            generated_text = json.loads(content).get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
             
             # Remove *** from the generated text
             generated_text = generated_text.replace("***", "")
             
             return generated_text
         else:
-            st.error(f"Gemini API Error: {response.status_code} - {response.text}")
+            st.error(f"Gemini API Error: {status_code} - {content.decode('utf-8', errors='replace')}")
             return None
     except Exception as e:
         st.error(f"Error generating recipe post with Gemini: {e}")
@@ -166,11 +252,11 @@ def generate_content(prompt):
         params = {
             "key": st.session_state.gemini_api_key
         }
-        response = requests.post(GEMINI_API_URL, headers=headers, json=payload, params=params)
-        if response.status_code == 200:
-            return response.json().get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
+        status_code, _, content = coalesced_post(GEMINI_API_URL, headers, payload, params)
+        if status_code == 200:
+            return json.loads(content).get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
         else:
-            st.error(f"Gemini API Error: {response.status_code} - {response.text}")
+            st.error(f"Gemini API Error: {status_code} - {content.decode('utf-8', errors='replace')}")
             return None
     except Exception as e:
         st.error(f"Error generating content: {e}")
@@ -269,13 +355,13 @@ def generate_segmind_image(prompt):
             "style": "any"  # Style of the image
         }
         
-        response = requests.post(SEGMIND_API_URL, headers=headers, json=payload)
+        status_code, response_headers, content = coalesced_post(SEGMIND_API_URL, headers, payload)
         
-        if response.status_code == 200:
-            if response.headers.get("Content-Type", "").startswith("image/"):
-                return response.content
+        if status_code == 200:
+            if response_headers.get("Content-Type", "").startswith("image/"):
+                return content
             else:
-                response_json = response.json()
+                response_json = json.loads(content)
                 image_url = response_json.get("data", {}).get("url", "")
                 if image_url:
                     return image_url
@@ -283,7 +369,7 @@ def generate_segmind_image(prompt):
                     st.error("No image URL or binary data found in the API response.")
                     return None
         else:
-            st.error(f"Segmind API Error: {response.status_code} - {response.text}")
+            st.error(f"Segmind API Error: {status_code} - {content.decode('utf-8', errors='replace')}")
             return None
     except Exception as e:
         st.error(f"Error generating image with Segmind: {e}")
@@ -486,6 +572,14 @@ def main():
     st.sidebar.title("Tools")
     app_mode = st.sidebar.radio("Choose a Tool", ["Generate Recipe", "SEO-Optimized Article Generator", "Recipe Generator from CSV", "Generate Images with Segmind", "Recipes History"])
 
+    # Server-wide API call statistics, only shown when enabled in secrets
+    if st.secrets.get("show_coalesce_stats", False):
+        coalesce_stats = get_coalesce_stats()
+        st.sidebar.caption(
+            f"Server-wide (all sessions): API calls saved by coalescing: "
+            f"{coalesce_stats['coalesced']} / {coalesce_stats['requests']} ({coalesce_stats['rate']:.0%})"
+        )
+
     # Main section title based on the selected tool
     if app_mode == "Generate Recipe":
         st.title("Generate Recipe")